@@ -2,7 +2,6 @@ import re
 import os
 import json
 import csv
-import pandas as pd
 import datetime
 from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
 import boto3
@@ -41,19 +40,45 @@ def download_existing_bat_csv():
         print(f"Downloaded existing bat.csv from S3")
         
         # Load existing data
-        existing_df = pd.read_csv('existing_bat.csv')
-        print(f"Found {len(existing_df)} existing rows")
+        with open('existing_bat.csv', newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            fieldnames = list(reader.fieldnames or [])
+            existing_rows = list(reader)
+        print(f"Found {len(existing_rows)} existing rows")
         
         # Get existing URLs to avoid duplicates
-        existing_urls = set(existing_df['auction_url'].dropna().values) if 'auction_url' in existing_df.columns else set()
+        existing_urls = {row['auction_url'] for row in existing_rows if row.get('auction_url')}
         
-        return existing_df, existing_urls
+        return existing_rows, fieldnames, existing_urls
     except s3.exceptions.NoSuchKey:
         print("No existing bat.csv in S3 - starting fresh")
-        return pd.DataFrame(), set()
+        return [], [], set()
     except Exception as e:
         print(f"Could not download existing data: {e}")
-        return pd.DataFrame(), set()
+        return [], [], set()
+
+def merge_rows(existing_rows, new_rows):
+    """Combine rows, keeping the last row seen for each auction_url"""
+    merged = {}
+    for row in existing_rows + new_rows:
+        url = row.get('auction_url') or ''
+        merged.pop(url, None)
+        merged[url] = row
+    return list(merged.values())
+
+def write_csv(path, rows, fieldnames):
+    """Write rows to CSV, extending the header with any new keys"""
+    columns = list(fieldnames)
+    seen = set(columns)
+    for row in rows:
+        for key in row:
+            if key not in seen:
+                seen.add(key)
+                columns.append(key)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, restval='')
+        writer.writeheader()
+        writer.writerows(rows)
 
 def extract_year_from_url(url):
     """Extract year from BAT URL pattern"""
@@ -134,6 +159,18 @@ SELECTORS = {
     "group_items": "div.group-item-wrap > div.group-item",
 }
 
+# Auction pages render every field we read server-side, so they are loaded
+# without JavaScript and without the heavy static assets
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font", "stylesheet"}
+
+def block_heavy_resources(route):
+    """Abort requests for assets the scraper never reads"""
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        route.abort()
+    else:
+        route.continue_()
+
 def collect_auction_urls(page):
     """Collect auction URLs from results page"""
     print(f"\n[4/8] Navigating to results page: {RESULTS_URL}")
@@ -149,8 +186,13 @@ def collect_auction_urls(page):
     max_failures = 3
 
     while loaded < MAX_AUCTIONS:
-        cards = page.query_selector_all(SELECTORS["tile"])
-        current = len(cards)
+        # One CDP call returns the hrefs of every tile not yet processed
+        hrefs = page.eval_on_selector_all(
+            SELECTORS["tile"],
+            "(els, skip) => els.slice(skip).map(e => e.href)",
+            loaded
+        )
+        current = loaded + len(hrefs)
         print(f"Loaded {current}/{MAX_AUCTIONS} listings")
 
         # If no new cards loaded, we might be at the end
@@ -163,8 +205,7 @@ def collect_auction_urls(page):
         else:
             consecutive_failures = 0
 
-        for card in cards[loaded: min(current, MAX_AUCTIONS)]:
-            href = card.get_attribute("href")
+        for href in hrefs[:max(MAX_AUCTIONS - loaded, 0)]:
             if href:
                 urls.append(href if href.startswith("http") else BASE_URL + href)
 
@@ -197,9 +238,9 @@ def collect_auction_urls(page):
         except Exception as e:
             print(f"Timeout waiting for more listings: {e}")
             page.wait_for_timeout(3000)
-            new_cards = page.query_selector_all(SELECTORS["tile"])
-            if len(new_cards) > current:
-                print(f"Found {len(new_cards) - current} additional listings after timeout")
+            new_count = page.eval_on_selector_all(SELECTORS["tile"], "els => els.length")
+            if new_count > current:
+                print(f"Found {new_count - current} additional listings after timeout")
                 continue
             else:
                 print("No additional listings found - stopping collection")
@@ -208,21 +249,34 @@ def collect_auction_urls(page):
     print(f"Collection complete: found {len(urls)} auction URLs")
     return urls
 
-def parse_auction(browser, url):
-    """Parse individual auction page - creates fresh page each time"""
-    # Create a completely fresh page for this auction
-    page = None
+def stop_loading(page):
+    """Halt a stalled navigation so the page can be reused for the next URL"""
     try:
-        page = browser.new_page()
-        page.set_default_timeout(30000)  # 30 second timeout
-        
+        page.evaluate("() => { window.stop() }")
+    except Exception:
+        pass
+
+def replace_page(context, page):
+    """Swap a crashed or wedged auction page for a fresh one from the same context"""
+    try:
+        page.close()
+    except Exception:
+        pass
+    new_page = context.new_page()
+    new_page.set_default_timeout(30000)
+    return new_page
+
+def parse_auction(page, url):
+    """Parse individual auction page - reuses the given page for each URL"""
+    try:
+        # Wait for the full DOM: the essentials and group items sit below the
+        # sale span, so a partially streamed page would drop them
         page.goto(url, timeout=45_000, wait_until="domcontentloaded")
-        page.wait_for_selector(SELECTORS["sale_span"], timeout=20_000)
+        page.wait_for_selector(SELECTORS["sale_span"], state="attached", timeout=20_000)
         
     except PlaywrightTimeoutError:
         print(f"    Timeout loading page")
-        if page:
-            page.close()
+        stop_loading(page)
         return {"auction_url": url, "error": "timeout"}
     except Exception as e:
         error_str = str(e)
@@ -230,8 +284,7 @@ def parse_auction(browser, url):
             print(f"    Dict error detected, skipping")
         else:
             print(f"    Failed to load: {error_str[:80]}")
-        if page:
-            page.close()
+        stop_loading(page)
         return {"auction_url": url, "error": "load_failed"}
     
     record = {"auction_url": url}
@@ -309,8 +362,6 @@ def parse_auction(browser, url):
     except:
         pass
 
-    # Close the page before returning
-    page.close()
     return record
 
 def run_scraper():
@@ -318,7 +369,7 @@ def run_scraper():
     print(f"\nStarting BAT Scraper - {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
     # Download existing data from S3
-    existing_df, existing_urls = download_existing_bat_csv()
+    existing_rows, existing_fields, existing_urls = download_existing_bat_csv()
     
     new_data = []
     years_extracted = []
@@ -330,6 +381,12 @@ def run_scraper():
         print("Launching Chromium browser (headless mode)...")
         browser = pw.chromium.launch(headless=True)
         print("Browser launched successfully")
+
+        # Results page needs JS for the load-more button; auction pages do not
+        auction_context = browser.new_context(java_script_enabled=False, user_agent=USER_AGENT)
+        auction_context.route("**/*", block_heavy_resources)
+        auction_page = auction_context.new_page()
+        auction_page.set_default_timeout(30000)  # 30 second timeout
         
         print("Creating page for URL collection...")
         collection_page = browser.new_page()
@@ -354,9 +411,11 @@ def run_scraper():
             for i, url in enumerate(urls_to_scrape, 1):
                 try:
                     print(f"\n[{i}/{len(urls_to_scrape)}] Processing: {url}")
-                    # Pass browser instead of page - function creates its own page
-                    data = parse_auction(browser, url)
+                    # Same JS-free page is navigated to every auction
+                    data = parse_auction(auction_page, url)
                     new_data.append(data)
+                    # window.stop() cannot rescue a crashed page; start over
+                    page_broken = data.get("error") == "load_failed"
                     
                     # Track year extraction success
                     if data.get('year'):
@@ -370,12 +429,24 @@ def run_scraper():
                 except Exception as e:
                     print(f"  Unexpected error: {str(e)[:80]}")
                     new_data.append({"auction_url": url, "error": str(e)[:100]})
+                    page_broken = True
+
+                if page_broken:
+                    try:
+                        auction_page = replace_page(auction_context, auction_page)
+                    except Exception as e:
+                        print(f"  Could not open a new auction page, stopping: {str(e)[:80]}")
+                        break
 
         except Exception as e:
             print(f"Error during URL collection: {e}")
             print("Proceeding with any data collected...")
         
         finally:
+            try:
+                auction_page.close()
+            except Exception:
+                pass
             print("\nClosing browser...")
             browser.close()
             print("Browser closed")
@@ -385,28 +456,23 @@ def run_scraper():
         return
 
     print(f"\n[8/8] Processing and saving data...")
-    # Create DataFrame from new data
-    new_df = pd.DataFrame(new_data)
-    print(f"Created DataFrame with {len(new_df)} new rows")
-    
     # Combine with existing data
-    if not existing_df.empty:
-        combined_df = pd.concat([existing_df, new_df], ignore_index=True)
+    if existing_rows:
         # Remove duplicates based on auction_url
-        combined_df = combined_df.drop_duplicates(subset=['auction_url'], keep='last')
-        print(f"Combined data: {len(combined_df)} total rows")
+        combined_rows = merge_rows(existing_rows, new_data)
+        print(f"Combined data: {len(combined_rows)} total rows")
     else:
-        combined_df = new_df
-        print(f"New dataset: {len(combined_df)} rows")
+        combined_rows = merge_rows([], new_data)
+        print(f"New dataset: {len(combined_rows)} rows")
     
     # Save to CSV
-    combined_df.to_csv("bat.csv", index=False)
+    write_csv("bat.csv", combined_rows, existing_fields)
     print(f"Saved to bat.csv")
 
     # Show summary
     print(f"\n" + "=" * 60)
     print("=== SUMMARY ===")
-    print(f"Total auctions in file: {len(combined_df)}")
+    print(f"Total auctions in file: {len(combined_rows)}")
     print(f"New auctions added: {len(new_data)}")
     if years_extracted:
         print(f"Years successfully extracted: {len(years_extracted)}/{len(new_data)}")
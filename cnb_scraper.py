@@ -1,30 +1,126 @@
+import asyncio
+import contextlib
 import csv
+import gzip
+import io
 import re
+import threading
 import time
-import os
+import random
 import boto3
+from boto3.s3.transfer import TransferConfig
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import datetime
 import requests
-from bs4 import BeautifulSoup
+from urllib3.util.retry import Retry
+from lxml import etree, html as lxml_html
 from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+from botocore.config import Config
 from botocore.exceptions import NoCredentialsError, ClientError
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 
 # === S3 CONFIGURATION ===
 S3_BUCKET = "my-mii-reports"
 CNB_CSV_FILENAME = "cnb.csv"
-TEMP_LOCAL_FILE = "temp_cnb.csv"
+CNB_PARQUET_FILENAME = "cnb.parquet"  # Columnar copy of cnb.csv for analytics
+SEEN_URLS_KEY = "cnb_seen_urls.txt.gz"  # Gzipped, one auction URL per line, mirrors cnb.csv
+STAGING_PREFIX = "staging/"  # Per-run progress shards, removed after the final upload
+PROGRESS_BATCH = 50
+RUN_ID = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+STAGED_SHARD_KEYS = []
+
+_s3_client = None
+_s3_client_lock = threading.Lock()
+
+def get_s3_client():
+    """Return the shared S3 client, creating it on first use"""
+    global _s3_client
+    # main() reads the manifest and leftover shards on parallel threads, and
+    # boto3 client creation is not thread-safe
+    with _s3_client_lock:
+        if _s3_client is None:
+            _s3_client = boto3.client('s3', config=Config(
+                max_pool_connections=50,
+                retries={"max_attempts": 5, "mode": "adaptive"},
+                tcp_keepalive=True
+            ))
+    return _s3_client
+
+# Low-cardinality columns stored dictionary-encoded in cnb.parquet and read
+# back as pandas categoricals
+CATEGORICAL_COLUMNS = ["make", "drivetrain", "transmission", "body_style", "title_status", "sale_type"]
+
+CNB_COLUMNS = [
+    "model", "make", "vin", "engine", "drivetrain", "transmission", "body_style",
+    "exterior_color", "interior_color", "title_status", "location", "mileage",
+    "sale_amount", "sale_date", "sale_type", "bids", "views", "comments",
+    "seller", "auction_url", "year", "scraped_date"
+]
+
+# Block size for Arrow's threaded parse of cnb.csv
+CSV_BLOCK_SIZE = 8 * 1024 * 1024
+
+# Multipart above 8 MB, with parts sent in parallel
+UPLOAD_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=10,
+    use_threads=True
+)
+
+def parquet_is_current(s3):
+    """True when cnb.parquet was written no earlier than cnb.csv"""
+    try:
+        parquet_head = s3.head_object(Bucket=S3_BUCKET, Key=CNB_PARQUET_FILENAME)
+        csv_head = s3.head_object(Bucket=S3_BUCKET, Key=CNB_CSV_FILENAME)
+        return parquet_head['LastModified'] >= csv_head['LastModified']
+    except ClientError:
+        return False
+
+def read_existing_cnb(s3, columns=None):
+    """Read cnb data from S3, preferring the columnar copy when it is current"""
+    if parquet_is_current(s3):
+        try:
+            body = s3.get_object(Bucket=S3_BUCKET, Key=CNB_PARQUET_FILENAME)['Body']
+            print(f"Downloading existing {CNB_PARQUET_FILENAME} from S3")
+            return pd.read_parquet(io.BytesIO(body.read()), columns=columns)
+        except Exception as e:
+            print(f"Could not read {CNB_PARQUET_FILENAME}, falling back to CSV: {e}")
+    
+    # Parse straight off the S3 response stream - no temp file on disk -
+    # with Arrow's CSV reader spreading the parse across cores
+    body = s3.get_object(Bucket=S3_BUCKET, Key=CNB_CSV_FILENAME)['Body']
+    print(f"Downloading existing cnb.csv from S3")
+    table = pacsv.read_csv(
+        body,
+        read_options=pacsv.ReadOptions(use_threads=True, block_size=CSV_BLOCK_SIZE),
+        # Scraped text fields can hold quoted newlines that cross block boundaries
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=columns,
+            strings_can_be_null=True,
+            # Same low-cardinality columns the Parquet copy dictionary-encodes;
+            # the rest are plain strings, so no block's type guess can reject
+            # a later block
+            column_types={
+                name: pa.dictionary(pa.int32(), pa.string()) if name in CATEGORICAL_COLUMNS else pa.string()
+                for name in CNB_COLUMNS
+            }
+        )
+    )
+    return table.to_pandas()
 
 def download_existing_cnb_csv():
     """Download existing cnb.csv from S3"""
-    s3 = boto3.client('s3')
+    s3 = get_s3_client()
     
     try:
-        s3.download_file(S3_BUCKET, CNB_CSV_FILENAME, TEMP_LOCAL_FILE)
-        print(f"Downloaded existing cnb.csv from S3")
-        
-        df = pd.read_csv(TEMP_LOCAL_FILE)
+        df = read_existing_cnb(s3)
         print(f"Existing data: {len(df)} rows, {len(df.columns)} columns")
         
         existing_urls = set(df['auction_url'].dropna().values)
@@ -35,91 +131,266 @@ def download_existing_cnb_csv():
     except ClientError as e:
         if e.response['Error']['Code'] == '404' or e.response['Error']['Code'] == 'NoSuchKey':
             print(f"No existing cnb.csv found in S3, will create new one")
-            columns = [
-                "model", "make", "vin", "engine", "drivetrain", "transmission", "body_style",
-                "exterior_color", "interior_color", "title_status", "location", "mileage",
-                "sale_amount", "sale_date", "sale_type", "bids", "views", "comments",
-                "seller", "auction_url", "year", "scraped_date"
-            ]
-            return pd.DataFrame(columns=columns), set()
+            return pd.DataFrame(columns=CNB_COLUMNS), set()
         else:
             raise
     except Exception as e:
         if "404" in str(e) or "Not Found" in str(e) or "NoSuchKey" in str(e):
             print(f"No existing cnb.csv found in S3 (starting fresh)")
-            columns = [
-                "model", "make", "vin", "engine", "drivetrain", "transmission", "body_style",
-                "exterior_color", "interior_color", "title_status", "location", "mileage",
-                "sale_amount", "sale_date", "sale_type", "bids", "views", "comments",
-                "seller", "auction_url", "year", "scraped_date"
-            ]
-            return pd.DataFrame(columns=columns), set()
+            return pd.DataFrame(columns=CNB_COLUMNS), set()
         else:
             print(f"Error downloading cnb.csv: {e}")
             raise
 
+def stream_csv_column(body, column):
+    """Yield one column's non-empty values from a CSV stream, row by row"""
+    reader = csv.reader(io.TextIOWrapper(body, encoding='utf-8', newline=''))
+    header = next(reader, None)
+    if not header or column not in header:
+        return
+    index = header.index(column)
+    for row in reader:
+        if len(row) > index and row[index]:
+            yield row[index]
+
+def load_existing_cnb_urls():
+    """Read only the auction_url column of the existing data for dedup"""
+    s3 = get_s3_client()
+    
+    try:
+        if parquet_is_current(s3):
+            df = read_existing_cnb(s3, columns=['auction_url'])
+            existing_urls = frozenset(df['auction_url'].dropna().values)
+        else:
+            # One column streamed off the response; no DataFrame at all
+            body = s3.get_object(Bucket=S3_BUCKET, Key=CNB_CSV_FILENAME)['Body']
+            print(f"Reading auction URLs from cnb.csv in S3")
+            existing_urls = frozenset(stream_csv_column(body, 'auction_url'))
+        print(f"Found {len(existing_urls)} existing auction URLs")
+        return existing_urls
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey'):
+            print(f"No existing cnb.csv found in S3, will create new one")
+            return frozenset()
+        raise
+
+def csv_to_parquet(csv_bytes):
+    """Re-encode cnb.csv as zstd Parquet with dictionary-encoded categoricals"""
+    # Parsing the CSV text back gives every column one consistent type,
+    # which the mixed str/float columns of a concatenated frame lack
+    df = pd.read_csv(io.BytesIO(csv_bytes), dtype={col: 'category' for col in CATEGORICAL_COLUMNS})
+    return df.to_parquet(engine='pyarrow', compression='zstd', index=False)
+
+def backup_cnb_csv(s3):
+    """Copy the current cnb.csv under backups/ before it is replaced"""
+    try:
+        s3.copy_object(
+            Bucket=S3_BUCKET,
+            CopySource={'Bucket': S3_BUCKET, 'Key': CNB_CSV_FILENAME},
+            Key=f"backups/{CNB_CSV_FILENAME}_{datetime.datetime.now().strftime('%Y%m%d_%H%M')}"
+        )
+        print(f"Created backup of existing cnb.csv")
+    except:
+        pass
+
 def upload_updated_cnb_csv(df):
     """Upload updated cnb.csv back to S3"""
-    s3 = boto3.client('s3')
+    s3 = get_s3_client()
     
     try:
-        df.to_csv(TEMP_LOCAL_FILE, index=False)
-        
-        try:
-            s3.copy_object(
-                Bucket=S3_BUCKET,
-                CopySource={'Bucket': S3_BUCKET, 'Key': CNB_CSV_FILENAME},
-                Key=f"backups/{CNB_CSV_FILENAME}_{datetime.datetime.now().strftime('%Y%m%d_%H%M')}"
+        # The backup copy runs server-side while the CSV is serialized, and
+        # the Parquet copy is encoded while the CSV uploads. The CSV upload
+        # still waits for the backup, and the Parquet upload for the CSV so
+        # it is never older than cnb.csv.
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            backup = pool.submit(backup_cnb_csv, s3)
+            # Serialize in memory; no temp file written and read back
+            csv_bytes = df.to_csv(index=False).encode('utf-8')
+            backup.result()
+            
+            csv_upload = pool.submit(
+                s3.upload_fileobj, io.BytesIO(csv_bytes), S3_BUCKET, CNB_CSV_FILENAME, Config=UPLOAD_CONFIG
             )
-            print(f"Created backup of existing cnb.csv")
-        except:
-            pass
-        
-        s3.upload_file(TEMP_LOCAL_FILE, S3_BUCKET, CNB_CSV_FILENAME)
+            try:
+                parquet_bytes = csv_to_parquet(csv_bytes)
+            except Exception as e:
+                parquet_bytes = None
+                print(f"Parquet conversion failed (cnb.csv is still uploaded): {e}")
+            csv_upload.result()
         print(f"Successfully uploaded updated cnb.csv to S3 ({len(df)} total rows)")
         
-        os.remove(TEMP_LOCAL_FILE)
+        if parquet_bytes is not None:
+            try:
+                s3.upload_fileobj(io.BytesIO(parquet_bytes), S3_BUCKET, CNB_PARQUET_FILENAME, Config=UPLOAD_CONFIG)
+                print(f"Uploaded columnar copy to s3://{S3_BUCKET}/{CNB_PARQUET_FILENAME}")
+            except Exception as e:
+                print(f"Parquet upload failed (cnb.csv is still current): {e}")
+        
         return True
         
     except Exception as e:
         print(f"Upload failed: {e}")
         return False
 
-SLEEP_BETWEEN_AUCTIONS = 3.0
+def upload_progress_shard(rows):
+    """Stage a batch of new rows in S3 so a crashed run loses at most one batch"""
+    s3 = get_s3_client()
+    key = f"{STAGING_PREFIX}cnb_shard_{RUN_ID}_{len(STAGED_SHARD_KEYS):04d}.csv"
+    
+    try:
+        # Rows are already dicts; write them straight out without pandas
+        text = io.StringIO()
+        writer = csv.DictWriter(text, fieldnames=CNB_COLUMNS, lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(rows)
+        body = text.getvalue().encode('utf-8')
+        s3.put_object(Bucket=S3_BUCKET, Key=key, Body=body)
+        STAGED_SHARD_KEYS.append(key)
+        print(f"Staged {len(rows)} rows to s3://{S3_BUCKET}/{key}")
+        return True
+    except Exception as e:
+        print(f"Progress upload failed: {e}")
+        return False
+
+def load_leftover_shards():
+    """Rows staged by earlier runs that stopped before their final upload
+
+    Their keys join this run's shards, so they are deleted once cnb.csv
+    holds the rows.
+    """
+    s3 = get_s3_client()
+    rows = []
+    
+    try:
+        paginator = s3.get_paginator('list_objects_v2')
+        for listing in paginator.paginate(Bucket=S3_BUCKET, Prefix=f"{STAGING_PREFIX}cnb_shard_"):
+            for obj in listing.get('Contents', []):
+                body = s3.get_object(Bucket=S3_BUCKET, Key=obj['Key'])['Body'].read()
+                rows.extend(csv.DictReader(io.StringIO(body.decode('utf-8'))))
+                STAGED_SHARD_KEYS.append(obj['Key'])
+    except Exception as e:
+        print(f"Could not read leftover shards: {e}")
+    
+    if rows:
+        print(f"Recovered {len(rows)} rows from {len(STAGED_SHARD_KEYS)} leftover shards")
+    return rows
+
+def clear_progress_shards():
+    """Drop this run's staged shards once cnb.csv holds all their rows"""
+    if not STAGED_SHARD_KEYS:
+        return
+    s3 = get_s3_client()
+    
+    try:
+        s3.delete_objects(
+            Bucket=S3_BUCKET,
+            Delete={'Objects': [{'Key': key} for key in STAGED_SHARD_KEYS]}
+        )
+        STAGED_SHARD_KEYS.clear()
+    except Exception as e:
+        print(f"Could not remove staged shards: {e}")
+
+def load_seen_urls():
+    """Stream the seen-URL manifest from S3; None if it does not exist yet"""
+    s3 = get_s3_client()
+    
+    try:
+        body = s3.get_object(Bucket=S3_BUCKET, Key=SEEN_URLS_KEY)['Body']
+        with gzip.GzipFile(fileobj=body) as lines:
+            seen_urls = {line.decode('utf-8').strip() for line in lines}
+        seen_urls.discard("")
+        print(f"Loaded {len(seen_urls)} seen auction URLs from {SEEN_URLS_KEY}")
+        return seen_urls
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey'):
+            print(f"No {SEEN_URLS_KEY} in S3 yet, falling back to cnb.csv")
+            return None
+        raise
+
+def save_seen_urls(seen_urls):
+    """Replace the seen-URL manifest in S3"""
+    s3 = get_s3_client()
+    
+    try:
+        body = gzip.compress("\n".join(sorted(seen_urls)).encode('utf-8'))
+        s3.put_object(Bucket=S3_BUCKET, Key=SEEN_URLS_KEY, Body=body)
+        print(f"Updated {SEEN_URLS_KEY} ({len(seen_urls)} URLs)")
+        return True
+    except Exception as e:
+        print(f"Failed to update {SEEN_URLS_KEY}: {e}")
+        return False
+
 MAX_AUCTIONS_PER_RUN = 300
+MAX_PARALLEL = 5  # Auction pages scraped concurrently in one context
+PAGE_MAX_USES = 50  # Auctions a pooled page loads before it is replaced
+MAX_PARALLEL_FETCHES = 10  # Plain HTTP auction GETs in flight at once
+FETCH_RETRIES = 3
+BACKOFF_STATUS_CODES = {429, 500, 502, 503, 504}
+FETCH_RATE = 5.0  # Average auction requests (GETs and navigations) per second, across the whole run
+FETCH_BURST = MAX_PARALLEL_FETCHES  # GETs allowed back to back after a lull
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+
+# Shared keep-alive session so the sitemap and every auction GET reuse
+# pooled TCP/TLS connections to carsandbids.com
+SESSION = requests.Session()
+SESSION.headers.update({'User-Agent': USER_AGENT})
+SESSION.mount("https://", requests.adapters.HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=MAX_PARALLEL_FETCHES,
+    # Connection-level failures only; throttling statuses are handled in
+    # fetch_auction_html so Retry-After is honoured
+    max_retries=Retry(total=3, backoff_factor=0.5)
+))
+
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font", "stylesheet"}
+# Analytics and ad hosts whose scripts keep the page busy without adding data
+BLOCKED_HOSTS = ("google-analytics", "googletagmanager", "doubleclick", "segment.io",
+                 "hotjar", "facebook.net")
+
+def is_blocked_request(request):
+    """True for assets and trackers the scraper never reads"""
+    return (request.resource_type in BLOCKED_RESOURCE_TYPES
+            or any(host in request.url for host in BLOCKED_HOSTS))
+
+async def block_heavy_resources(route):
+    """Abort requests for assets the scraper never reads"""
+    if is_blocked_request(route.request):
+        await route.abort()
+    else:
+        await route.continue_()
+
+def sitemap_locs(response):
+    """Yield the stripped text of every <loc> element in a streamed sitemap"""
+    # iterparse reads the socket as the body arrives and hands over each
+    # <loc> as it closes; clearing it keeps memory flat however large the
+    # sitemap grows
+    response.raw.decode_content = True
+    for _, elem in etree.iterparse(response.raw, tag="{*}loc"):
+        if elem.text:
+            yield elem.text.strip()
+        elem.clear()
 
 def get_sitemap_urls():
     """Get CNB auction URLs"""
     print("Fetching CNB sitemap...")
     
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
         sitemap_url = "https://carsandbids.com/sitemap.xml"
-        response = requests.get(sitemap_url, headers=headers, timeout=30)
+        auction_sitemap = None
+        with SESSION.get(sitemap_url, timeout=30, stream=True) as response:
+            if response.status_code == 200:
+                # Stop reading the index as soon as the auctions entry shows up
+                auction_sitemap = next((loc for loc in sitemap_locs(response) if "auctions" in loc), None)
         
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, "xml")
-            locs = soup.find_all("loc")
-            
-            auction_sitemap = None
-            for loc in locs:
-                if "auctions" in loc.text:
-                    auction_sitemap = loc.text
-                    break
-            
-            if auction_sitemap:
-                print(f"Found auctions sitemap: {auction_sitemap}")
-                response = requests.get(auction_sitemap, headers=headers, timeout=30)
+        if auction_sitemap:
+            print(f"Found auctions sitemap: {auction_sitemap}")
+            urls = []
+            with SESSION.get(auction_sitemap, timeout=30, stream=True) as response:
                 if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, "xml")
-                    locs = soup.find_all("loc")
-                    urls = [loc.text.strip() for loc in locs if "/auctions/" in loc.text]
-                    if urls:
-                        print(f"Found {len(urls)} auction URLs from sitemap")
-                        return urls
+                    urls = [loc for loc in sitemap_locs(response) if "/auctions/" in loc]
+            if urls:
+                print(f"Found {len(urls)} auction URLs from sitemap")
+                return urls
     except Exception as e:
         print(f"Sitemap failed: {e}")
     
@@ -128,6 +399,10 @@ def get_sitemap_urls():
         with sync_playwright() as p:
             browser = p.chromium.launch(headless=True)
             page = browser.new_page()
+            # Only the anchors matter here; skip the same heavy assets as auction pages
+            page.route("**/*", lambda route: route.abort()
+                       if is_blocked_request(route.request)
+                       else route.continue_())
             
             page.goto("https://carsandbids.com/past-auctions/", timeout=60_000)
             
@@ -144,11 +419,13 @@ def get_sitemap_urls():
                 page.evaluate("window.scrollBy(0, 1000)")
                 time.sleep(1)
             
-            links = page.query_selector_all("a")
+            # One round trip for every href instead of one per link
+            hrefs = page.eval_on_selector_all(
+                "a[href*='/auctions/']", "els => els.map(e => e.getAttribute('href'))"
+            )
             urls = set()
             
-            for link in links:
-                href = link.get_attribute("href")
+            for href in hrefs:
                 if href and "/auctions/" in href and href != "/past-auctions/":
                     if href.startswith("/"):
                         href = "https://carsandbids.com" + href
@@ -165,19 +442,34 @@ def get_sitemap_urls():
         traceback.print_exc()
         return []
 
+# Compiled once at import; these run for every auction scraped. The combined
+# URL year pattern handles most URLs in one pass; the separate patterns only
+# run when its match is out of range
+URL_YEAR_PATTERN = re.compile(r'/auctions/(?:[^/]*-)?(\d{4})-|-(\d{4})-')
+URL_YEAR_PATTERNS = (
+    re.compile(r'/auctions/[^/]*-(\d{4})-'),
+    re.compile(r'/auctions/(\d{4})-'),
+    re.compile(r'-(\d{4})-'),
+)
+TITLE_YEAR_PATTERN = re.compile(r'\b(?:19|20)\d{2}\b')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+SAVE_PATTERN = re.compile(r'\s*save\s*', re.IGNORECASE)
+DIGITS_PATTERN = re.compile(r'(\d+)')
+
 def extract_year_from_url(url):
     """Extract year from CNB URL patterns"""
     if not url:
         return None
     
-    patterns = [
-        r'/auctions/[^/]*-(\d{4})-',
-        r'/auctions/(\d{4})-',
-        r'-(\d{4})-'
-    ]
+    match = URL_YEAR_PATTERN.search(url)
+    if not match:
+        return None
+    year = int(match.group(1) or match.group(2))
+    if 1900 <= year <= 2030:
+        return year
     
-    for pattern in patterns:
-        match = re.search(pattern, url)
+    for pattern in URL_YEAR_PATTERNS:
+        match = pattern.search(url)
         if match:
             year = int(match.group(1))
             if 1900 <= year <= 2030:
@@ -188,12 +480,117 @@ def clean_text(text):
     """Clean text by removing extra whitespace and 'Save'"""
     if not text:
         return ""
-    text = re.sub(r'\s+', ' ', text)
-    text = re.sub(r'\s*save\s*', '', text, flags=re.IGNORECASE)
+    text = WHITESPACE_PATTERN.sub(' ', text)
+    text = SAVE_PATTERN.sub('', text)
     return text.strip()
 
-def extract_all_auction_data(page, auction_url):
-    """Extract comprehensive data from CNB auction page"""
+# Lowercased makes used to infer "make" from the title when facts lack it
+COMMON_MAKES = frozenset({
+    'toyota', 'honda', 'ford', 'chevrolet', 'bmw', 'mercedes',
+    'audi', 'volkswagen', 'nissan', 'mazda', 'porsche', 'ferrari'
+})
+
+def _has_class(cls):
+    """XPath predicate matching elements that carry a CSS class"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {cls} ')"
+
+# Each field lists selectors in priority order; the first non-empty match wins
+FIELD_SELECTORS = {
+    "model": [("h1", "//h1")],
+    "sale_amount": [
+        ("span.bid-value", f"//span[{_has_class('bid-value')}]"),
+        (".bid-value", f"//*[{_has_class('bid-value')}]"),
+        (".final-bid", f"//*[{_has_class('final-bid')}]"),
+        (".current-bid", f"//*[{_has_class('current-bid')}]"),
+    ],
+    "sale_date": [
+        ("span.time-ended", f"//span[{_has_class('time-ended')}]"),
+        (".auction-end-time", f"//*[{_has_class('auction-end-time')}]"),
+    ],
+    "sale_type": [("span.value", f"//span[{_has_class('value')}]")],
+    "bids": [("li.num-bids", f"//li[{_has_class('num-bids')}]")],
+    "views": [("li span.views", f"//li//span[{_has_class('views')}]")],
+    "comments": [
+        (".comments-count", f"//*[{_has_class('comments-count')}]"),
+        (".comment-count", f"//*[{_has_class('comment-count')}]"),
+    ],
+    "seller": [("li.seller", f"//li[{_has_class('seller')}]")],
+}
+
+# Every quick-facts <dt> followed directly by its <dd>, in document order, as
+# one flat [dt, dd, dt, dd, ...] list from a single compiled traversal
+FACT_PAIRS_XPATH = etree.XPath(
+    "//dl//dt[following-sibling::*[1][self::dd]]"
+    " | //dl//dt/following-sibling::*[1][self::dd]"
+)
+
+# Markers only a live auction renders: the countdown and the bid controls
+LIVE_MARKERS_XPATH = etree.XPath(" | ".join(
+    f"//*[{_has_class(cls)}]" for cls in ("time-left", "countdown", "bid-button", "place-bid")
+))
+
+def read_html_fields(page_html):
+    """Read raw field text and dl facts from server-rendered auction HTML"""
+    tree = lxml_html.fromstring(page_html)
+    
+    fields = {}
+    for field, selectors in FIELD_SELECTORS.items():
+        for _, xpath in selectors:
+            nodes = tree.xpath(xpath)
+            text = nodes[0].text_content().strip() if nodes else ""
+            if text:
+                fields[field] = text
+                break
+    
+    facts = {}
+    for dt, dd in zip(*[iter(FACT_PAIRS_XPATH(tree))] * 2):
+        key = dt.text_content().strip().replace(" ", "_").lower()
+        value = dd.text_content()
+        if key and value.strip():
+            facts[key] = value
+    
+    return fields, facts
+
+# Reads every field and the dt/dd facts in one page.evaluate round trip
+EXTRACT_JS = """(css) => {
+    const fields = {};
+    for (const [field, selectors] of Object.entries(css)) {
+        for (const sel of selectors) {
+            const text = (document.querySelector(sel)?.innerText || '').trim();
+            if (text) { fields[field] = text; break; }
+        }
+    }
+    const facts = {};
+    for (const dt of document.querySelectorAll('dl dt')) {
+        const dd = dt.nextElementSibling;
+        const key = dt.innerText.trim().replace(/ /g, '_').toLowerCase();
+        if (key && dd && dd.innerText.trim()) facts[key] = dd.innerText;
+    }
+    return {fields, facts};
+}"""
+
+# CSS half of FIELD_SELECTORS, in the shape EXTRACT_JS expects
+FIELD_CSS = {field: [selector for selector, _ in selectors]
+             for field, selectors in FIELD_SELECTORS.items()}
+
+async def read_page_fields(page):
+    """Read raw field text and dl facts from a rendered Playwright page"""
+    try:
+        raw = await page.evaluate(EXTRACT_JS, FIELD_CSS)
+        return raw["fields"], raw["facts"]
+    except Exception as e:
+        print(f"    Field extraction error: {e}")
+        return {}, {}
+
+# Quick-facts keys copied straight into the record; "model" only fills a
+# missing title
+FACT_FIELDS = frozenset({
+    "make", "model", "vin", "engine", "drivetrain", "transmission", "body_style",
+    "exterior_color", "interior_color", "title_status", "location", "mileage"
+})
+
+def build_auction_record(fields, facts, auction_url):
+    """Turn raw field text and facts into a cnb.csv row"""
     
     data = {
         "model": "",
@@ -220,257 +617,440 @@ def extract_all_auction_data(page, auction_url):
         "scraped_date": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     }
     
+    data["model"] = clean_text(fields.get("model", ""))
+    
+    data["year"] = extract_year_from_url(auction_url)
+    if not data["year"] and data["model"]:
+        year_match = TITLE_YEAR_PATTERN.search(data["model"])
+        if year_match:
+            data["year"] = int(year_match.group(0))
+    
+    data["sale_amount"] = fields.get("sale_amount", "")
+    data["sale_date"] = fields.get("sale_date", "")
+    
+    sale_text = fields.get("sale_type", "").lower()
+    if sale_text:
+        if "sold" in sale_text:
+            data["sale_type"] = "sold"
+        elif "reserve" in sale_text:
+            data["sale_type"] = "reserve not met"
+        else:
+            data["sale_type"] = sale_text
+    
+    bids_match = DIGITS_PATTERN.search(fields.get("bids", ""))
+    if bids_match:
+        data["bids"] = int(bids_match.group(1))
+    
+    data["views"] = fields.get("views", "").replace(",", "")
+    
+    comments_match = DIGITS_PATTERN.search(fields.get("comments", ""))
+    if comments_match:
+        data["comments"] = int(comments_match.group(1))
+    
+    data["seller"] = clean_text(fields.get("seller", ""))
+    
+    for key, raw_value in facts.items():
+        if key not in FACT_FIELDS:
+            continue
+        value = clean_text(raw_value)
+        if value and not (key == "model" and data["model"]):
+            data[key] = value
+    
+    if not data["make"] and data["model"]:
+        for word in data["model"].split():
+            if word.lower() in COMMON_MAKES:
+                data["make"] = word
+                break
+    
+    print(f"    Extracted: {data['model'][:40] if data['model'] else 'Unknown'}... | "
+          f"${data['sale_amount']} | {data['views']} views | {data['bids']} bids")
+    
+    return data
+
+# Token bucket shared by every fetch thread and browser navigation in the
+# single scraping process, so FETCH_RATE is the run's total request rate; a
+# throttling response pauses all of them, not just the request that got it
+_throttle_lock = threading.Lock()
+_throttle = {"tokens": float(FETCH_BURST), "updated": time.monotonic(), "paused_until": 0.0}
+
+def take_fetch_slot():
+    """Take a token if one is free; returns 0, else seconds until one is"""
+    with _throttle_lock:
+        now = time.monotonic()
+        _throttle["tokens"] = min(FETCH_BURST, _throttle["tokens"] + (now - _throttle["updated"]) * FETCH_RATE)
+        _throttle["updated"] = now
+        wait = _throttle["paused_until"] - now
+        if wait > 0:
+            return wait
+        if _throttle["tokens"] >= 1:
+            _throttle["tokens"] -= 1
+            return 0
+        return (1 - _throttle["tokens"]) / FETCH_RATE
+
+def wait_for_fetch_slot():
+    """Block until the token bucket allows another auction GET"""
+    while True:
+        wait = take_fetch_slot()
+        if not wait:
+            return
+        time.sleep(wait)
+
+async def wait_for_page_slot():
+    """Await a token for a browser navigation without holding a thread"""
+    while True:
+        wait = take_fetch_slot()
+        if not wait:
+            return
+        await asyncio.sleep(wait)
+
+def pause_fetches(delay):
+    """Hold every auction GET for delay seconds"""
+    with _throttle_lock:
+        _throttle["paused_until"] = max(_throttle["paused_until"], time.monotonic() + delay)
+
+def backoff_delay(attempt, base=5):
+    """Exponential backoff with jitter so concurrent retries don't line up"""
+    return round(base * 2 ** attempt * (1 + random.uniform(0, 0.5)), 1)
+
+def retry_after_seconds(response, attempt):
+    """Delay requested by a throttling response, else exponential backoff"""
     try:
-        page.wait_for_selector("body", timeout=15000)
-        time.sleep(2)
-        
-        try:
-            title_element = page.query_selector("h1")
-            if title_element:
-                data["model"] = clean_text(title_element.inner_text())
-        except:
-            pass
-        
-        data["year"] = extract_year_from_url(auction_url)
-        if not data["year"] and data["model"]:
-            year_match = re.search(r'\b(19|20)\d{2}\b', data["model"])
-            if year_match:
-                data["year"] = int(year_match.group(0))
-        
-        try:
-            bid_selectors = [
-                "span.bid-value",
-                ".bid-value",
-                ".final-bid",
-                ".current-bid"
-            ]
-            for selector in bid_selectors:
-                element = page.query_selector(selector)
-                if element:
-                    text = element.inner_text().strip()
-                    if text:
-                        data["sale_amount"] = text
-                        break
-        except:
-            pass
-        
+        return int(response.headers.get('Retry-After', ''))
+    except ValueError:
+        return backoff_delay(attempt)
+
+def fetch_auction_html(auction_url):
+    """GET an auction page; returns (html, in_progress)
+
+    html is None unless the auction has ended. in_progress is True only when
+    the server-rendered page shows a live countdown or bid control; any other
+    page without an end time is left for the browser to render.
+    """
+    # No fixed pause between auctions - the token bucket sets the average
+    # rate and a 429 or 5xx pauses every fetch thread
+    for attempt in range(FETCH_RETRIES):
+        wait_for_fetch_slot()
         try:
-            date_element = page.query_selector("span.time-ended") or page.query_selector(".auction-end-time")
-            if date_element:
-                data["sale_date"] = date_element.inner_text().strip()
-            
-            sale_type_element = page.query_selector("span.value")
-            if sale_type_element:
-                sale_text = sale_type_element.inner_text().lower()
-                if "sold" in sale_text:
-                    data["sale_type"] = "sold"
-                elif "reserve" in sale_text:
-                    data["sale_type"] = "reserve not met"
-                else:
-                    data["sale_type"] = sale_text
-        except:
-            pass
+            response = SESSION.get(auction_url, timeout=20)
+        except Exception as e:
+            print(f"    HTTP fetch failed: {str(e)[:80]}")
+            return None, False
         
-        try:
-            bids_element = page.query_selector("li.num-bids")
-            if bids_element:
-                bids_text = bids_element.inner_text()
-                bids_match = re.search(r'(\d+)', bids_text)
-                if bids_match:
-                    data["bids"] = int(bids_match.group(1))
-        except:
-            pass
+        if response.status_code in BACKOFF_STATUS_CODES:
+            delay = retry_after_seconds(response, attempt)
+            print(f"    HTTP {response.status_code}, backing off {delay}s")
+            pause_fetches(delay)
+            continue
         
+        if response.status_code != 200:
+            return None, False
+        if "time-ended" in response.text:
+            return response.text, False
         try:
-            views_element = page.query_selector("li span.views")
-            if views_element:
-                data["views"] = views_element.inner_text().replace(",", "")
-        except:
-            pass
-        
+            return None, bool(LIVE_MARKERS_XPATH(lxml_html.fromstring(response.text)))
+        except Exception:
+            return None, False
+    return None, False
+
+async def extract_all_auction_data(page, auction_url):
+    """Extract comprehensive data from CNB auction page (None while still live)"""
+    try:
+        # Wait for the bid box instead of sleeping a fixed interval
         try:
-            comments_element = page.query_selector(".comments-count") or page.query_selector(".comment-count")
-            if comments_element:
-                comments_text = comments_element.inner_text()
-                comments_match = re.search(r'(\d+)', comments_text)
-                if comments_match:
-                    data["comments"] = int(comments_match.group(1))
-        except:
+            await page.wait_for_selector("span.bid-value, .final-bid", timeout=10000)
+        except PlaywrightTimeoutError:
             pass
         
-        try:
-            seller_element = page.query_selector("li.seller")
-            if seller_element:
-                data["seller"] = clean_text(seller_element.inner_text())
-        except:
-            pass
-        
-        try:
-            fact_containers = page.query_selector_all("dl")
-            for container in fact_containers:
-                dt_elements = container.query_selector_all("dt")
-                for dt in dt_elements:
-                    try:
-                        key = dt.inner_text().strip().replace(" ", "_").lower()
-                        dd = dt.evaluate_handle("el => el.nextElementSibling")
-                        if dd and dd.as_element():
-                            value = clean_text(dd.as_element().inner_text())
-                            if value and key:
-                                if key == "make":
-                                    data["make"] = value
-                                elif key == "model":
-                                    data["model"] = value if not data["model"] else data["model"]
-                                elif key == "vin":
-                                    data["vin"] = value
-                                elif key == "engine":
-                                    data["engine"] = value
-                                elif key == "drivetrain":
-                                    data["drivetrain"] = value
-                                elif key == "transmission":
-                                    data["transmission"] = value
-                                elif key == "body_style":
-                                    data["body_style"] = value
-                                elif key == "exterior_color":
-                                    data["exterior_color"] = value
-                                elif key == "interior_color":
-                                    data["interior_color"] = value
-                                elif key == "title_status":
-                                    data["title_status"] = value
-                                elif key == "location":
-                                    data["location"] = value
-                                elif key == "mileage":
-                                    data["mileage"] = value
-                    except:
-                        continue
-        except Exception as e:
-            print(f"    Facts extraction error: {e}")
-        
-        if not data["make"] and data["model"]:
-            model_words = data["model"].split()
-            if len(model_words) > 0:
-                common_makes = ['Toyota', 'Honda', 'Ford', 'Chevrolet', 'BMW', 'Mercedes', 
-                               'Audi', 'Volkswagen', 'Nissan', 'Mazda', 'Porsche', 'Ferrari']
-                for word in model_words:
-                    if any(make.lower() == word.lower() for make in common_makes):
-                        data["make"] = word
-                        break
-        
-        print(f"    Extracted: {data['model'][:40] if data['model'] else 'Unknown'}... | "
-              f"${data['sale_amount']} | {data['views']} views | {data['bids']} bids")
-        
-        return data
+        fields, facts = await read_page_fields(page)
+        if not fields.get("sale_date", "").strip():
+            # Still live; nothing worth building a record for
+            return None
+        return build_auction_record(fields, facts, auction_url)
         
     except Exception as e:
         print(f"    Extraction error: {str(e)[:100]}")
         traceback.print_exc()
-        return data
+        return build_auction_record({}, {}, auction_url)
 
-def main():
-    print(f"Starting CNB Scraper (Append Mode) - {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    
-    existing_df, existing_urls = download_existing_cnb_csv()
-    
-    all_urls = get_sitemap_urls()
-    
-    if not all_urls:
-        print("Failed to get sitemap URLs!")
-        return False
-    
-    new_urls = [url for url in all_urls if url not in existing_urls]
-    print(f"Found {len(new_urls)} new auctions to scrape")
-    
-    if not new_urls:
-        print("No new auctions found - cnb.csv is up to date!")
-        return True
-    
-    new_urls = new_urls[:MAX_AUCTIONS_PER_RUN]
-    print(f"Processing {len(new_urls)} new auctions (max {MAX_AUCTIONS_PER_RUN} per run)")
+async def prewarm_context(context):
+    """Visit the homepage once so cookies and origin setup are shared"""
+    warm = await context.new_page()
+    try:
+        await warm.goto("https://carsandbids.com/", wait_until="domcontentloaded", timeout=30000)
+    except Exception as e:
+        print(f"  Context prewarm failed: {str(e)[:80]}")
+    finally:
+        await warm.close()
+
+async def load_auction_page(page, auction_url):
+    """Navigate a Playwright page to the auction (with retries) and extract it"""
+    for retry in range(3):
+        await wait_for_page_slot()
+        try:
+            await page.goto(auction_url, timeout=45_000, wait_until="domcontentloaded")
+            break
+        except Exception as nav_error:
+            if retry == 2:
+                raise nav_error
+            print(f"  Retry {retry + 1}")
+            await asyncio.sleep(backoff_delay(retry, base=2))
     
+    return await extract_all_auction_data(page, auction_url)
+
+async def scrape_auctions(new_urls):
+    """Scrape auctions concurrently: MAX_PARALLEL_FETCHES HTTP GETs and at
+    most MAX_PARALLEL Chromium pages in flight at a time
+
+    Every 50 new rows are staged to S3 as a shard.
+    """
     new_rows = []
+    stats = {"successful": 0, "failed": 0, "skipped_in_progress": 0}
+    fetch_sem = asyncio.Semaphore(MAX_PARALLEL_FETCHES)
+    # to_thread's default pool can be smaller than the fetch limit
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(MAX_PARALLEL_FETCHES + 1))
+    # Idle pages, reused across auctions; at most MAX_PARALLEL are ever opened
+    page_pool = asyncio.Queue()
+    pages_opened = 0
+    page_uses = {}
+    save_lock = asyncio.Lock()
+    staged = 0  # new_rows[:staged] are already in shards
     
-    with sync_playwright() as p:
-        browser = p.chromium.launch(
-            headless=True,
-            args=[
-                "--no-sandbox",
-                "--disable-dev-shm-usage",
-                "--disable-web-security",
-                "--disable-features=VizDisplayCompositor"
-            ]
-        )
-        context = browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-        )
+    async with async_playwright() as p:
+        # Chromium is only launched once some auction actually needs it, so
+        # a run served entirely over HTTP never starts one
+        browser = None
+        launch = None
+        
+        async def launch_browser():
+            nonlocal browser
+            browser = await p.chromium.launch(
+                headless=True,
+                args=[
+                    "--no-sandbox",
+                    "--disable-dev-shm-usage",
+                    "--disable-web-security",
+                    "--disable-features=VizDisplayCompositor"
+                ]
+            )
+            context = await browser.new_context(
+                user_agent=USER_AGENT
+            )
+            await context.route("**/*", block_heavy_resources)
+            return context
+        
+        async def get_context():
+            nonlocal launch
+            if launch is None:
+                launch = asyncio.ensure_future(launch_browser())
+            return await launch
         
-        successful = 0
-        failed = 0
-        skipped_in_progress = 0
+        # Shared by every fallback page; started on the first one
+        warmup = None
         
-        for i, auction_url in enumerate(new_urls):
-            print(f"\n[{i+1}/{len(new_urls)}] Processing: {auction_url}")
-            page = None
+        async def warm_context():
+            nonlocal warmup
+            if warmup is None:
+                warmup = asyncio.ensure_future(prewarm_context(await get_context()))
+            await warmup
+        
+        def release_slot():
+            # A page could not be opened; free its slot and wake a waiter
+            # (None in the pool) so it tries to open one itself
+            nonlocal pages_opened
+            pages_opened -= 1
+            page_pool.put_nowait(None)
+        
+        async def acquire_page():
+            nonlocal pages_opened
+            while True:
+                if page_pool.empty() and pages_opened < MAX_PARALLEL:
+                    pages_opened += 1
+                    try:
+                        return await (await get_context()).new_page()
+                    except Exception:
+                        release_slot()
+                        raise
+                page = await page_pool.get()
+                if page is not None:
+                    return page
+        
+        async def replace_page(page):
+            page_uses.pop(page, None)
+            # A crashed page may fail to close; the slot must still be
+            # refilled or released below
+            with contextlib.suppress(Exception):
+                await page.close()
+            try:
+                page_pool.put_nowait(await (await get_context()).new_page())
+            except Exception:
+                release_slot()
+        
+        async def scrape_with_browser(auction_url):
+            page = await acquire_page()
+            try:
+                await warm_context()
+                data = await load_auction_page(page, auction_url)
+            except Exception:
+                # The page may be wedged mid-navigation; swap in a fresh one
+                await replace_page(page)
+                raise
             
+            page_uses[page] = page_uses.get(page, 0) + 1
+            if page_uses[page] >= PAGE_MAX_USES:
+                # Recycle long-lived pages so renderer memory stays bounded
+                await replace_page(page)
+            else:
+                page_pool.put_nowait(page)
+            return data
+        
+        async def scrape_one(i, auction_url):
+            nonlocal staged
             try:
-                page = context.new_page()
+                # Completed auctions are server-rendered, so a plain GET
+                # usually suffices; only fall back to Chromium without it
+                async with fetch_sem:
+                    print(f"\n[{i+1}/{len(new_urls)}] Processing: {auction_url}")
+                    page_html, in_progress = await asyncio.to_thread(fetch_auction_html, auction_url)
                 
-                for retry in range(3):
-                    try:
-                        page.goto(auction_url, timeout=45_000, wait_until="domcontentloaded")
-                        break
-                    except Exception as nav_error:
-                        if retry == 2:
-                            raise nav_error
-                        print(f"  Retry {retry + 1}")
-                        time.sleep(5)
+                if in_progress:
+                    # Known live from the plain GET; skip the browser render
+                    print(f"  Skipping - auction still in progress")
+                    stats["skipped_in_progress"] += 1
+                    return
                 
-                data = extract_all_auction_data(page, auction_url)
+                fields, facts = read_html_fields(page_html) if page_html else ({}, {})
+                if fields.get("model") or fields.get("sale_amount"):
+                    data = build_auction_record(fields, facts, auction_url)
+                else:
+                    # Missing from the static HTML; let Chromium render it
+                    data = await scrape_with_browser(auction_url)
                 
-                if not data['sale_date'] or data['sale_date'].strip() == "":
+                if data is None or not data['sale_date'].strip():
                     print(f"  Skipping - auction still in progress")
-                    skipped_in_progress += 1
-                    continue
+                    stats["skipped_in_progress"] += 1
+                    return
                 
                 if data['model'] or data['views'] or data['bids']:
                     new_rows.append(data)
-                    successful += 1
+                    stats["successful"] += 1
                 else:
                     print(f"  Insufficient data extracted")
-                    failed += 1
+                    stats["failed"] += 1
+                    return
                     
             except Exception as e:
                 print(f"  Error: {str(e)[:150]}")
-                failed += 1
-                
-            finally:
-                if page:
-                    page.close()
-                time.sleep(SLEEP_BETWEEN_AUCTIONS)
-                
-                if len(new_rows) > 0 and len(new_rows) % 50 == 0:
+                stats["failed"] += 1
+                return
+            
+            async with save_lock:
+                # Other tasks may append while a shard uploads, so stage
+                # everything past the last shard rather than a fixed slice
+                if len(new_rows) - staged >= PROGRESS_BATCH:
+                    batch = new_rows[staged:]
                     print(f"\nSaving progress ({len(new_rows)} new rows)...")
-                    temp_df = pd.concat([existing_df, pd.DataFrame(new_rows)], ignore_index=True)
-                    upload_updated_cnb_csv(temp_df)
+                    if await asyncio.to_thread(upload_progress_shard, batch):
+                        staged += len(batch)
+        
+        await asyncio.gather(*(scrape_one(i, url) for i, url in enumerate(new_urls)))
         
-        browser.close()
+        if browser is not None:
+            await browser.close()
         
         print(f"\nScraping complete:")
-        print(f"   Successful: {successful}")
-        print(f"   In-progress skipped: {skipped_in_progress}")
-        print(f"   Failed: {failed}")
+        print(f"   Successful: {stats['successful']}")
+        print(f"   In-progress skipped: {stats['skipped_in_progress']}")
+        print(f"   Failed: {stats['failed']}")
+    
+    return new_rows
+
+def with_typed_keys(df):
+    """Give the URL and sort keys typed dtypes instead of Python objects"""
+    return df.assign(
+        auction_url=df['auction_url'].astype('string[pyarrow]'),
+        year=pd.to_numeric(df['year'], errors='coerce').astype('Int16')
+    )
+
+def merge_sorted_by_year(existing_df, new_df):
+    """Slot new rows into the year-sorted existing rows (newest first,
+    unknown years last) without re-sorting the whole table
+
+    Ties keep existing rows first, as a stable sort of the concatenation
+    would. Falls back to that full sort if existing_df is not in order.
+    """
+    new_df = new_df.sort_values('year', ascending=False, na_position='last', kind='stable')
+    combined = pd.concat([existing_df, new_df], ignore_index=True)
+    
+    years = existing_df['year']
+    missing = years.isna().to_numpy()
+    known = years[~missing].to_numpy(dtype='int64')
+    if missing[:len(known)].any() or (known[1:] > known[:-1]).any():
+        return combined.sort_values('year', ascending=False, na_position='last', kind='stable')
+    
+    # Each new row lands after every existing row of the same or a later year
+    new_years = new_df['year']
+    positions = np.full(len(new_df), len(existing_df))
+    new_known = new_years.notna().to_numpy()
+    positions[new_known] = np.searchsorted(-known, -new_years[new_known].to_numpy(dtype='int64'), side='right')
+    
+    order = np.insert(np.arange(len(existing_df)), positions, len(existing_df) + np.arange(len(new_df)))
+    return combined.iloc[order].reset_index(drop=True)
+
+def main():
+    print(f"Starting CNB Scraper (Append Mode) - {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    
+    # Dedupe against the small URL manifest; cnb.csv itself is only needed
+    # once there is something new to add to it
+    # The manifest read and the sitemap fetch are independent round trips,
+    # so run them side by side
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        seen_future = pool.submit(load_seen_urls)
+        sitemap_future = pool.submit(get_sitemap_urls)
+        # Rows a stopped earlier run staged but never merged into cnb.csv
+        leftover_future = pool.submit(load_leftover_shards)
+        existing_urls = seen_future.result()
+        if existing_urls is None:
+            existing_urls = load_existing_cnb_urls()
+        all_urls = sitemap_future.result()
+        recovered_rows = leftover_future.result()
+    
+    if not all_urls:
+        print("Failed to get sitemap URLs!")
+        return False
+    
+    # Recovered auctions are merged below, so don't scrape them again
+    existing_urls = existing_urls | {row['auction_url'] for row in recovered_rows}
+    new_urls = [url for url in all_urls if url not in existing_urls]
+    print(f"Found {len(new_urls)} new auctions to scrape")
+    
+    if not new_urls and not recovered_rows:
+        print("No new auctions found - cnb.csv is up to date!")
+        return True
+    
+    new_rows = list(recovered_rows)
+    new_urls = new_urls[:MAX_AUCTIONS_PER_RUN]
+    if new_urls:
+        print(f"Processing {len(new_urls)} new auctions (max {MAX_AUCTIONS_PER_RUN} per run)")
+        
+        new_rows += asyncio.run(scrape_auctions(new_urls))
     
     if new_rows:
-        print(f"\nAdding {len(new_rows)} new rows to cnb.csv")
-        new_df = pd.DataFrame(new_rows)
+        existing_df, stored_urls = download_existing_cnb_csv()
         
-        updated_df = pd.concat([existing_df, new_df], ignore_index=True)
+        # Only new rows can collide (the manifest may lag cnb.csv), so filter
+        # them against the stored URLs instead of deduping the whole table
+        unique_rows = []
+        for row in new_rows:
+            if row['auction_url'] not in stored_urls:
+                stored_urls.add(row['auction_url'])
+                unique_rows.append(row)
+        if len(unique_rows) != len(new_rows):
+            print(f"Removed {len(new_rows) - len(unique_rows)} duplicate rows")
         
-        before_dedup = len(updated_df)
-        updated_df = updated_df.drop_duplicates(subset=['auction_url'], keep='first')
-        after_dedup = len(updated_df)
-        if before_dedup != after_dedup:
-            print(f"Removed {before_dedup - after_dedup} duplicate rows")
+        print(f"\nAdding {len(unique_rows)} new rows to cnb.csv")
+        new_df = with_typed_keys(pd.DataFrame.from_records(unique_rows, columns=CNB_COLUMNS))
         
-        updated_df = updated_df.sort_values('year', ascending=False, na_position='last')
+        updated_df = merge_sorted_by_year(with_typed_keys(existing_df), new_df)
         
         print(f"Updated cnb.csv stats:")
         print(f"   Total rows: {len(updated_df)}")
@@ -480,6 +1060,8 @@ def main():
         
         if upload_updated_cnb_csv(updated_df):
             print(f"Successfully updated cnb.csv in S3!")
+            save_seen_urls(existing_urls | set(updated_df['auction_url'].dropna()))
+            clear_progress_shards()
             return True
         else:
             print(f"Failed to upload updated cnb.csv")
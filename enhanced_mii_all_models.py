@@ -3,17 +3,97 @@ import numpy as np
 import datetime
 import re
 import os
+import csv
+import functools
 import boto3
+import pyarrow as pa
+import pyarrow.csv as pacsv
+from concurrent.futures import ThreadPoolExecutor
+from botocore.config import Config
 from botocore.exceptions import NoCredentialsError
 
-def upload_to_s3(file_name, bucket, object_name=None):
-    """Upload file to S3 bucket"""
-    s3 = boto3.client('s3')
-    if object_name is None:
-        object_name = file_name
+# Byte-range window and parallelism for large S3 downloads
+RANGE_CHUNK_SIZE = 16 * 1024 * 1024
+RANGE_WORKERS = 8
+
+# Scraped CSVs are parsed and cleaned in blocks of this many bytes
+CSV_BLOCK_SIZE = 16 * 1024 * 1024
+
+# Scraped CSV columns used downstream; everything else is skipped at parse time
+SCRAPED_COLUMNS = {
+    'model', 'title', 'auction_url', 'views', 'bids', 'comments', 'year',
+    'make', 'sale_amount', 'sale_date', 'scraped_date',
+}
+SCRAPED_DTYPE = pd.StringDtype('pyarrow')
+
+# Instagram audience estimates by model/brand keyword
+KNOWN_ESTIMATES = {
+    # BMW Models
+    "bmw": 650000, "m3": 280000, "e30": 18000, "e36": 15000, "e46": 42000,
+    "2002": 12000, "z8": 4500, "m5": 14000, "m4": 35000, "z4": 22000,
+    
+    # Mercedes Models  
+    "mercedes": 480000, "190e": 18000, "c63": 45000, "amg": 65000,
+    "g-class": 55000, "sl": 18000,
+    
+    # Porsche Models
+    "porsche": 450000, "911": 150000, "turbo": 45000, "gt3": 65000,
+    "boxster": 28000, "cayman": 32000,
+    
+    # Japanese Performance
+    "toyota": 180000, "supra": 55000, "nissan": 120000, "gtr": 38000,
+    "honda": 160000, "s2000": 35000, "nsx": 22000,
+    
+    # American Muscle
+    "ford": 180000, "mustang": 85000, "chevrolet": 150000, "corvette": 95000,
+    "camaro": 65000, "challenger": 45000,
+    
+    # Supercars
+    "ferrari": 320000, "lamborghini": 280000, "mclaren": 85000,
+}
+
+# Keyword priority follows table order; the lookahead finds overlapping
+# matches so one scan per model sees every key it contains
+ESTIMATE_KEY_ORDER = {key: i for i, key in enumerate(KNOWN_ESTIMATES)}
+ESTIMATE_KEYS_PATTERN = re.compile(
+    '(?=(' + '|'.join(re.escape(key) for key in KNOWN_ESTIMATES) + '))'
+)
+PREMIUM_BRANDS_PATTERN = re.compile('bmw|mercedes|porsche|ferrari')
+VOLUME_BRANDS_PATTERN = re.compile('toyota|honda|nissan')
+
+# Patterns used when cleaning scraped fields
+NUMBER_PATTERN = re.compile(r'(\d+)')
+THOUSANDS_PATTERN = re.compile(r',')
+CURRENCY_PATTERN = re.compile(r'[$,]')
+YEAR_PATTERN = re.compile(r'\b((?:19|20)\d{2})\b')
+LISTING_SLUG_PATTERN = re.compile(r'/listing/([^/]+)$')
+
+# Columns kept after cleaning; everything calculate_mii_scores reads
+CLEANED_COLUMNS = [
+    'model', 'quarter', 'views_numeric', 'bids_numeric', 'comments_numeric',
+    'sale_amount_numeric', 'year', 'car_age', 'make', 'data_source',
+]
+
+_s3_client = None
+
+def get_s3_client():
+    """Return the shared S3 client, creating it on first use"""
+    global _s3_client
+    if _s3_client is None:
+        # Enough pooled connections for both sources' parallel range GETs
+        _s3_client = boto3.session.Session().client('s3', config=Config(
+            max_pool_connections=32,
+            retries={"max_attempts": 10, "mode": "adaptive"},
+            tcp_keepalive=True
+        ))
+    return _s3_client
+
+def upload_to_s3(body, bucket, object_name, s3=None):
+    """Upload in-memory CSV bytes to S3 bucket"""
+    s3 = s3 or get_s3_client()
     try:
-        s3.upload_file(file_name, bucket, object_name)
-        print(f"✅ File {file_name} uploaded to s3://{bucket}/{object_name}")
+        s3.put_object(Bucket=bucket, Key=object_name, Body=body, ContentType='text/csv')
+        print(f"✅ Uploaded s3://{bucket}/{object_name}")
         return True
     except NoCredentialsError:
         print("❌ AWS credentials not available")
@@ -22,33 +102,24 @@ def upload_to_s3(file_name, bucket, object_name=None):
         print(f"❌ Upload failed: {e}")
         return False
 
+def copy_in_s3(bucket, source_key, object_name, s3=None):
+    """Copy an object within S3 bucket without re-uploading it"""
+    s3 = s3 or get_s3_client()
+    try:
+        s3.copy_object(Bucket=bucket, Key=object_name,
+                       CopySource={'Bucket': bucket, 'Key': source_key})
+        print(f"✅ Copied s3://{bucket}/{source_key} to s3://{bucket}/{object_name}")
+        return True
+    except NoCredentialsError:
+        print("❌ AWS credentials not available")
+        return False
+    except Exception as e:
+        print(f"❌ Copy failed: {e}")
+        return False
+
+@functools.lru_cache(maxsize=4)
 def get_instagram_estimates(all_models):
-    """Generate Instagram estimates for models"""
-    known_estimates = {
-        # BMW Models
-        "bmw": 650000, "m3": 280000, "e30": 18000, "e36": 15000, "e46": 42000,
-        "2002": 12000, "z8": 4500, "m5": 14000, "m4": 35000, "z4": 22000,
-        
-        # Mercedes Models  
-        "mercedes": 480000, "190e": 18000, "c63": 45000, "amg": 65000,
-        "g-class": 55000, "sl": 18000,
-        
-        # Porsche Models
-        "porsche": 450000, "911": 150000, "turbo": 45000, "gt3": 65000,
-        "boxster": 28000, "cayman": 32000,
-        
-        # Japanese Performance
-        "toyota": 180000, "supra": 55000, "nissan": 120000, "gtr": 38000,
-        "honda": 160000, "s2000": 35000, "nsx": 22000,
-        
-        # American Muscle
-        "ford": 180000, "mustang": 85000, "chevrolet": 150000, "corvette": 95000,
-        "camaro": 65000, "challenger": 45000,
-        
-        # Supercars
-        "ferrari": 320000, "lamborghini": 280000, "mclaren": 85000,
-    }
-    
+    """Generate Instagram estimates for a tuple of unique models"""
     estimates = {}
     for model in all_models:
         if pd.isna(model):
@@ -57,95 +128,164 @@ def get_instagram_estimates(all_models):
         model_clean = str(model).lower()
         instagram_count = 8000  # Default
         
-        # Check for matches
-        for key, count in known_estimates.items():
-            if key in model_clean:
-                instagram_count = max(instagram_count, int(count * 0.3))
-                break
+        # Use the first known key (in table order) contained in the model
+        matches = ESTIMATE_KEYS_PATTERN.findall(model_clean)
+        if matches:
+            key = min(matches, key=ESTIMATE_KEY_ORDER.get)
+            instagram_count = max(instagram_count, int(KNOWN_ESTIMATES[key] * 0.3))
         
         # Brand-based estimation
-        if any(brand in model_clean for brand in ['bmw', 'mercedes', 'porsche', 'ferrari']):
+        if PREMIUM_BRANDS_PATTERN.search(model_clean):
             instagram_count = max(instagram_count, 20000)
-        elif any(brand in model_clean for brand in ['toyota', 'honda', 'nissan']):
+        elif VOLUME_BRANDS_PATTERN.search(model_clean):
             instagram_count = max(instagram_count, 12000)
         
         estimates[model] = instagram_count
     
     return estimates
 
-def load_scraped_data():
-    """Load data from single bat.csv and cnb.csv files in S3"""
-    print("📋 Looking for scraped data in S3...")
-    
-    s3 = boto3.client('s3')
-    all_data = []
-    
-    # Load BAT data from S3
+def read_s3_object(s3, bucket, key):
+    """Return an S3 object's bytes, fetching large ones in parallel byte ranges"""
+    head = s3.head_object(Bucket=bucket, Key=key)
+    size = head['ContentLength']
+    etag = head['ETag']
+    if size <= RANGE_CHUNK_SIZE:
+        return s3.get_object(Bucket=bucket, Key=key)['Body'].read()
+    
+    buffer = bytearray(size)
+    
+    def fetch_range(start):
+        end = min(start + RANGE_CHUNK_SIZE, size) - 1
+        # Pin every range to the object the HEAD saw, so an overwrite mid-download
+        # fails instead of stitching two versions together
+        body = s3.get_object(Bucket=bucket, Key=key, Range=f'bytes={start}-{end}', IfMatch=etag)['Body'].read()
+        if len(body) != end - start + 1:
+            raise IOError(f"Short read of {key} bytes {start}-{end}: got {len(body)} bytes")
+        buffer[start:start + len(body)] = body
+    
+    with ThreadPoolExecutor(max_workers=RANGE_WORKERS) as executor:
+        list(executor.map(fetch_range, range(0, size, RANGE_CHUNK_SIZE)))
+    
+    return bytes(buffer)
+
+def fetch_source_csv(s3, key):
+    """Fetch one scraped CSV's bytes from S3, falling back to a local copy"""
     try:
-        print(f"📊 Downloading bat.csv from S3...")
-        s3.download_file('my-mii-reports', 'bat.csv', 'temp_bat.csv')
-        df = pd.read_csv('temp_bat.csv')
-        df['data_source'] = 'BAT'
-        
-        # Standardize column names for MII calculation
-        if 'model' not in df.columns and 'title' in df.columns:
-            df['model'] = df['title']
-        elif 'model' not in df.columns and 'auction_url' in df.columns:
-            # Extract model from URL if needed
-            df['model'] = df['auction_url'].str.extract(r'/listing/([^/]+)$')[0]
-        
-        all_data.append(df)
-        print(f"  ✅ Loaded {len(df)} BAT records")
-        
-        # Clean up temp file
-        os.remove('temp_bat.csv')
-        
+        print(f"📊 Downloading {key} from S3...")
+        # Keep the bytes in memory, no temp file
+        return read_s3_object(s3, 'my-mii-reports', key), True
     except Exception as e:
-        print(f"  ⚠️ Could not load bat.csv from S3: {e}")
+        print(f"  ⚠️ Could not load {key} from S3: {e}")
         # Try local file as fallback
-        if os.path.exists('bat.csv'):
-            df = pd.read_csv('bat.csv')
-            df['data_source'] = 'BAT'
-            all_data.append(df)
-            print(f"  ✅ Loaded {len(df)} BAT records from local file")
-    
-    # Load CNB data from S3
-    try:
-        print(f"📊 Downloading cnb.csv from S3...")
-        s3.download_file('my-mii-reports', 'cnb.csv', 'temp_cnb.csv')
-        df = pd.read_csv('temp_cnb.csv')
-        df['data_source'] = 'CNB'
-        all_data.append(df)
-        print(f"  ✅ Loaded {len(df)} CNB records")
+        if os.path.exists(key):
+            with open(key, 'rb') as f:
+                return f.read(), False
+    return None, False
+
+def csv_header(data):
+    """Return the column names from the first line of CSV bytes"""
+    # Slice off just the first line; split() would copy the rest of the file too
+    end = data.find(b'\n')
+    first_line = data if end == -1 else data[:end]
+    return next(csv.reader([first_line.decode('utf-8-sig')]), [])
+
+def source_columns(header, source, from_s3):
+    """Columns a source contributes once standardized for MII calculation"""
+    columns = [c for c in header if c in SCRAPED_COLUMNS]
+    if (source == 'BAT' and from_s3 and 'model' not in columns
+            and ('title' in columns or 'auction_url' in columns)):
+        columns.append('model')
+    return columns + ['data_source']
+
+def iter_scraped_csv(data):
+    """Yield the used columns of a scraped CSV as string DataFrames, one block at a time"""
+    columns = [c for c in csv_header(data) if c in SCRAPED_COLUMNS]
+    reader = pacsv.open_csv(
+        pa.py_buffer(data),
+        read_options=pacsv.ReadOptions(use_threads=True, block_size=CSV_BLOCK_SIZE),
+        # Scraped titles can hold quoted newlines that cross block boundaries
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=columns,
+            column_types={c: pa.string() for c in columns},
+            strings_can_be_null=True,
+        ),
+    )
+    for batch in reader:
+        yield batch.to_pandas(types_mapper={pa.string(): SCRAPED_DTYPE}.get)
+
+def load_source_records(data, source, from_s3, columns):
+    """Parse and clean one source chunk by chunk, keeping only the cleaned columns"""
+    cleaned = []
+    for df in iter_scraped_csv(data):
+        df['data_source'] = source
         
-        # Clean up temp file
-        os.remove('temp_cnb.csv')
+        # Standardize column names for MII calculation
+        if source == 'BAT' and from_s3:
+            if 'model' not in df.columns and 'title' in df.columns:
+                df['model'] = df['title']
+            elif 'model' not in df.columns and 'auction_url' in df.columns:
+                # Extract model from URL if needed
+                df['model'] = df['auction_url'].str.extract(LISTING_SLUG_PATTERN)[0]
         
-    except Exception as e:
-        print(f"  ⚠️ Could not load cnb.csv from S3: {e}")
-        # Try local file as fallback
-        if os.path.exists('cnb.csv'):
-            df = pd.read_csv('cnb.csv')
-            df['data_source'] = 'CNB'
+        # Align to the combined column set so cleaning sees the same columns for every
+        # source; added columns keep the string dtype so sources concat without promotion
+        missing = {c: SCRAPED_DTYPE for c in columns if c not in df.columns}
+        cleaned.append(clean_and_process_data(df.reindex(columns=columns).astype(missing)))
+    
+    if not cleaned:
+        return None
+    df = pd.concat(cleaned, ignore_index=True, copy=False)
+    print(f"  ✅ Loaded {len(df)} {source} records{'' if from_s3 else ' from local file'}")
+    return df
+
+def load_scraped_data(s3=None):
+    """Load and clean data from single bat.csv and cnb.csv files in S3"""
+    print("📋 Looking for scraped data in S3...")
+    
+    # boto3 clients are thread-safe, so both downloads share one
+    s3 = s3 or get_s3_client()
+    keys = {'BAT': 'bat.csv', 'CNB': 'cnb.csv'}
+    
+    # Download BAT and CNB data concurrently
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        fetched = dict(zip(keys, executor.map(lambda key: fetch_source_csv(s3, key), keys.values())))
+    fetched = {source: result for source, result in fetched.items() if result[0] is not None}
+    
+    # Union of the columns every source provides, in first-seen order
+    columns = list(dict.fromkeys(
+        c for source, (data, from_s3) in fetched.items()
+        for c in source_columns(csv_header(data), source, from_s3)
+    ))
+    
+    print("🧹 Cleaning and processing data...")
+    all_data = []
+    for source, (data, from_s3) in fetched.items():
+        try:
+            df = load_source_records(data, source, from_s3, columns)
+        except Exception as e:
+            print(f"  ⚠️ Could not parse {keys[source]}: {e}")
+            continue
+        if df is not None:
             all_data.append(df)
-            print(f"  ✅ Loaded {len(df)} CNB records from local file")
     
     if not all_data:
         print("❌ No scraped data found!")
         return pd.DataFrame()
     
     # Combine all data
-    combined_df = pd.concat(all_data, ignore_index=True, sort=False)
+    combined_df = pd.concat(all_data, ignore_index=True, copy=False)
     print(f"📈 Combined total: {len(combined_df)} auction records")
     print(f"   BAT records: {len(combined_df[combined_df['data_source'] == 'BAT'])}")
     print(f"   CNB records: {len(combined_df[combined_df['data_source'] == 'CNB'])}")
+    print(f"✅ Cleaned data: {len(combined_df)} records with {combined_df['model'].nunique()} unique models")
+    print(f"   Average views: {combined_df['views_numeric'].mean():.0f}")
+    print(f"   Average bids: {combined_df['bids_numeric'].mean():.1f}")
     
     return combined_df
 
 def clean_and_process_data(df):
-    """Clean and standardize the scraped data"""
-    print("🧹 Cleaning and processing data...")
-    
+    """Clean and standardize a chunk of scraped data, keeping only the columns MII needs"""
     # Ensure we have required columns
     required_cols = ['model', 'views', 'bids', 'data_source']
     for col in required_cols:
@@ -153,29 +293,31 @@ def clean_and_process_data(df):
             df[col] = 0 if col in ['views', 'bids'] else 'Unknown'
     
     # Clean model names
+    df = df[df['model'].notna()]
     df['model'] = df['model'].astype(str).str.strip()
     df = df[df['model'] != 'nan']
     df = df[df['model'] != '']
-    df = df[df['model'].notna()]
-    
-    # Extract numeric values from text fields
-    def extract_number(val):
-        if pd.isna(val):
-            return 0
-        # Handle both string and numeric inputs
-        if isinstance(val, (int, float)):
-            return int(val)
-        matches = re.findall(r'\d+', str(val).replace(',', ''))
-        return int(matches[0]) if matches else 0
     
-    df['views_numeric'] = df['views'].apply(extract_number)
-    df['bids_numeric'] = df['bids'].apply(extract_number)
+    # Extract numeric values from text fields (first run of digits, commas ignored)
+    # Counts and prices fit in int32, which halves their memory
+    def extract_number(values, strip=THOUSANDS_PATTERN):
+        if pd.api.types.is_numeric_dtype(values):
+            numbers = values.fillna(0)
+        else:
+            digits = (values.astype(str)
+                      .str.replace(strip, '', regex=True)
+                      .str.extract(NUMBER_PATTERN, expand=False))
+            numbers = pd.to_numeric(digits, errors='coerce').fillna(0)
+        return numbers.clip(upper=np.iinfo(np.int32).max).astype(np.int32)
+    
+    df['views_numeric'] = extract_number(df['views'])
+    df['bids_numeric'] = extract_number(df['bids'])
     
     # Handle comments if the column exists
     if 'comments' in df.columns:
-        df['comments_numeric'] = df['comments'].apply(extract_number)
+        df['comments_numeric'] = extract_number(df['comments'])
     else:
-        df['comments_numeric'] = 0
+        df['comments_numeric'] = np.int32(0)
     
     # Add quarter information
     if 'scraped_date' in df.columns:
@@ -186,66 +328,35 @@ def clean_and_process_data(df):
         current_quarter = f"{datetime.datetime.now().year}Q{(datetime.datetime.now().month-1)//3 + 1}"
         df['quarter'] = current_quarter
     
-    # Extract year from multiple possible sources
-    def extract_year(row):
-        # Try year column first
-        if 'year' in row and pd.notna(row['year']):
-            try:
-                year = int(row['year'])
-                if 1900 <= year <= datetime.datetime.now().year + 2:
-                    return year
-            except:
-                pass
-        
-        # Try extracting from model name
-        if 'model' in row and pd.notna(row['model']):
-            matches = re.findall(r'\b(19|20)\d{2}\b', str(row['model']))
-            if matches:
-                year = int(matches[0])
-                if 1900 <= year <= datetime.datetime.now().year + 2:
-                    return year
-        
-        return None
-    
-    df['year'] = df.apply(extract_year, axis=1)
-    df['car_age'] = datetime.datetime.now().year - df['year'].fillna(datetime.datetime.now().year)
+    # Extract year from the year column, falling back to a year in the model name
+    max_year = datetime.datetime.now().year + 2
+    if 'year' in df.columns:
+        year_col = np.trunc(pd.to_numeric(df['year'], errors='coerce').astype(np.float64))
+    else:
+        year_col = pd.Series(np.nan, index=df.index)
+    year_from_model = pd.to_numeric(
+        df['model'].str.extract(YEAR_PATTERN, expand=False), errors='coerce'
+    ).astype(np.float64)
+    year_from_model = year_from_model.where(year_from_model <= max_year)
+    df['year'] = year_col.where(year_col.between(1900, max_year), year_from_model).astype(np.float32)
+    df['car_age'] = (datetime.datetime.now().year - df['year'].fillna(datetime.datetime.now().year)).astype(np.int16)
     
     # Extract sale amounts if present
     if 'sale_amount' in df.columns:
-        def extract_sale_amount(val):
-            if pd.isna(val):
-                return 0
-            # Remove $ and commas, extract number
-            val_str = str(val).replace('$', '').replace(',', '')
-            matches = re.findall(r'\d+', val_str)
-            return int(matches[0]) if matches else 0
-        
-        df['sale_amount_numeric'] = df['sale_amount'].apply(extract_sale_amount)
+        # Remove $ and commas, extract number
+        df['sale_amount_numeric'] = extract_number(df['sale_amount'], strip=CURRENCY_PATTERN)
     else:
-        df['sale_amount_numeric'] = 0
+        df['sale_amount_numeric'] = np.int32(0)
     
-    print(f"✅ Cleaned data: {len(df)} records with {df['model'].nunique()} unique models")
-    print(f"   Average views: {df['views_numeric'].mean():.0f}")
-    print(f"   Average bids: {df['bids_numeric'].mean():.1f}")
-    
-    return df
+    return df[[c for c in CLEANED_COLUMNS if c in df.columns]]
 
 def calculate_mii_scores(df):
     """Calculate MII scores for the models"""
     print("🧮 Calculating MII scores...")
     
-    # Get Instagram estimates
-    all_models = df['model'].unique()
-    instagram_estimates = get_instagram_estimates(all_models)
-    
-    # Create Instagram DataFrame and merge
-    instagram_df = pd.DataFrame([
-        {'model': model, 'instagram_mentions': count} 
-        for model, count in instagram_estimates.items()
-    ])
-    
-    df = df.merge(instagram_df, on='model', how='left')
-    df['instagram_mentions'] = df['instagram_mentions'].fillna(8000)
+    # Get Instagram estimates and map them straight onto each row
+    instagram_estimates = get_instagram_estimates(tuple(df['model'].unique()))
+    df['instagram_mentions'] = df['model'].map(instagram_estimates).fillna(8000).astype(np.int32)
     
     # Group by model and quarter
     agg_dict = {
@@ -268,19 +379,14 @@ def calculate_mii_scores(df):
     grouped = grouped.rename(columns={'data_source': 'total_auctions'})
     
     # Calculate z-scores within each quarter
-    def calculate_quarter_scores(group):
-        metrics = ['views_numeric', 'bids_numeric', 'comments_numeric', 
-                  'sale_amount_numeric', 'total_auctions', 'instagram_mentions', 'car_age']
-        
-        for metric in metrics:
-            if metric in group.columns and group[metric].std() > 0:
-                group[f'z_{metric}'] = (group[metric] - group[metric].mean()) / group[metric].std()
-            else:
-                group[f'z_{metric}'] = 0
-        
-        return group
-    
-    grouped = grouped.groupby('quarter').apply(calculate_quarter_scores).reset_index(drop=True)
+    metrics = ['views_numeric', 'bids_numeric', 'comments_numeric', 
+              'sale_amount_numeric', 'total_auctions', 'instagram_mentions', 'car_age']
+    by_quarter = grouped.groupby('quarter')[metrics]
+    mean = by_quarter.transform('mean')
+    std = by_quarter.transform('std')
+    z_scores = ((grouped[metrics] - mean) / std).where(std > 0, 0)
+    z_scores.columns = [f'z_{metric}' for metric in metrics]
+    grouped = pd.concat([grouped, z_scores], axis=1)
     
     # Calculate MII with weighted scoring
     mii_weights = {
@@ -293,27 +399,19 @@ def calculate_mii_scores(df):
         'z_car_age': 1.0                # Classic appeal
     }
     
-    total_weight = sum(mii_weights.values())
-    
-    grouped['MII_Score'] = sum(
-        grouped.get(col, 0) * weight for col, weight in mii_weights.items()
-    ) / total_weight
+    # Weighted average of the z-scores as one matrix-vector product
+    weights = np.array(list(mii_weights.values()))
+    z_matrix = grouped[list(mii_weights.keys())].to_numpy(dtype=np.float64)
+    grouped['MII_Score'] = z_matrix @ (weights / weights.sum())
     
-    # Calculate MII Index (0-100 scale per quarter)
-    def calculate_index(group):
-        if len(group) > 0:
-            max_score = group['MII_Score'].max()
-            min_score = group['MII_Score'].min()
-            if max_score != min_score:
-                group['MII_Index'] = ((group['MII_Score'] - min_score) / (max_score - min_score)) * 100
-            else:
-                group['MII_Index'] = 50  # Default if all same
-        return group
+    # Calculate MII Index (0-100 scale per quarter, 50 if all scores are the same)
+    score_by_quarter = grouped.groupby('quarter')['MII_Score']
+    min_score = score_by_quarter.transform('min')
+    score_range = score_by_quarter.transform('max') - min_score
+    grouped['MII_Index'] = (((grouped['MII_Score'] - min_score) / score_range) * 100).where(score_range != 0, 50)
     
-    grouped = grouped.groupby('quarter').apply(calculate_index).reset_index(drop=True)
-    
-    # Add ranking
-    grouped['Quarter_Rank'] = grouped.groupby('quarter')['MII_Index'].rank(ascending=False, method='min')
+    # Add ranking (the index is monotonic in the score, so rank on the existing grouping)
+    grouped['Quarter_Rank'] = score_by_quarter.rank(ascending=False, method='min')
     
     # Calculate momentum (quarter-over-quarter change)
     grouped = grouped.sort_values(['model', 'quarter'])
@@ -343,14 +441,21 @@ def generate_insights(mii_results):
     print(f"{'Rank':<5} {'Model':<35} {'MII':<8} {'Views':<10} {'Bids':<8} {'Year':<6}")
     print("-" * 75)
     
-    for _, row in latest_data.head(10).iterrows():
-        model_short = row['model'][:33] + '..' if len(row['model']) > 35 else row['model']
-        year_display = str(int(row['year'])) if pd.notna(row['year']) else 'N/A'
-        views_display = f"{row['views_numeric']:.0f}" if pd.notna(row['views_numeric']) else 'N/A'
-        bids_display = f"{row['bids_numeric']:.0f}" if pd.notna(row['bids_numeric']) else 'N/A'
-        
-        print(f"{int(row['Quarter_Rank']):<5} {model_short:<35} {row['MII_Index']:<8.1f} "
-              f"{views_display:<10} {bids_display:<8} {year_display:<6}")
+    # Format the whole top 10 column by column, then print it in one write
+    top = latest_data.head(10)
+    
+    def display(values, fmt):
+        return values.map(fmt.format, na_action='ignore').fillna('N/A')
+    
+    model_short = top['model'].where(top['model'].str.len() <= 35, top['model'].str[:33] + '..')
+    lines = (top['Quarter_Rank'].astype(int).astype(str).str.ljust(5) + ' '
+             + model_short.str.ljust(35) + ' '
+             + top['MII_Index'].map('{:<8.1f}'.format) + ' '
+             + display(top['views_numeric'], '{:.0f}').str.ljust(10) + ' '
+             + display(top['bids_numeric'], '{:.0f}').str.ljust(8) + ' '
+             + display(top['year'], '{:.0f}').str.ljust(6))
+    if len(lines):
+        print('\n'.join(lines))
     
     # Biggest movers (if we have multiple quarters)
     if len(mii_results['quarter'].unique()) > 1:
@@ -380,16 +485,10 @@ def main():
     print("🚀 MII Calculator - Single File Version")
     print(f"⏰ Started at: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
-    # Load scraped data from S3
-    raw_data = load_scraped_data()
-    if raw_data.empty:
-        print("❌ No data to process!")
-        return False
-    
-    # Clean and process
-    clean_data = clean_and_process_data(raw_data)
+    # Load scraped data from S3, cleaned chunk by chunk as it is parsed
+    clean_data = load_scraped_data()
     if clean_data.empty:
-        print("❌ No clean data to process!")
+        print("❌ No data to process!")
         return False
     
     # Calculate MII scores
@@ -398,19 +497,18 @@ def main():
     # Generate insights
     latest_quarter = generate_insights(mii_results)
     
-    # Save results
+    # Serialize results once, in memory
     output_file = f"mii_results_{datetime.datetime.now().strftime('%Y%m%d_%H%M')}.csv"
-    mii_results.to_csv(output_file, index=False)
-    print(f"\n💾 Saved results to: {output_file}")
+    results_csv = mii_results.to_csv(index=False).encode('utf-8')
+    print(f"\n💾 Prepared {output_file} ({len(results_csv):,} bytes)")
     
     # Upload to S3
     print(f"☁️ Uploading to S3...")
-    success = upload_to_s3(output_file, "my-mii-reports")
+    success = upload_to_s3(results_csv, "my-mii-reports", output_file)
     
-    # Also save a "latest" version for easy access
+    # Also save a "latest" version for easy access, copied server-side
     if success:
-        mii_results.to_csv("mii_results_latest.csv", index=False)
-        upload_to_s3("mii_results_latest.csv", "my-mii-reports")
+        success = copy_in_s3("my-mii-reports", output_file, "mii_results_latest.csv")
     
     # Summary statistics
     print(f"\n📊 FINAL STATISTICS")
@@ -420,14 +518,6 @@ def main():
     print(f"Latest quarter: {latest_quarter}")
     print(f"Average MII Index: {mii_results[mii_results['quarter'] == latest_quarter]['MII_Index'].mean():.1f}")
     
-    # Cleanup
-    try:
-        os.remove(output_file)
-        if os.path.exists("mii_results_latest.csv"):
-            os.remove("mii_results_latest.csv")
-    except:
-        pass
-    
     print(f"\n{'🎉 MII calculation completed successfully!' if success else '⚠️ MII completed but S3 upload failed'}")
     return success
 